@@ -10,7 +10,11 @@ import argparse
 import traceback
 import configparser
 import json
-from typing import List, Tuple, Optional, Dict, Any, Set
+import csv
+import pathlib
+import concurrent.futures
+from itertools import chain, islice
+from typing import List, Tuple, Optional, Dict, Any, Set, Iterator
 
 # Attempt to import the required database driver library
 try:
@@ -19,6 +23,12 @@ except ImportError:
     print("FATAL: The 'pyodbc' library is not installed. Please install it using 'pip install pyodbc'", file=sys.stderr, flush=True)
     sys.exit(1)
 
+# Prefer the faster orjson decoder when it is installed; the standard json module is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # --- Static Configuration ---
 APP_NAME = "PhoneQA_DB_Importer"
@@ -28,6 +38,90 @@ DEFAULT_CALLS_ROOT_DIR = r"C:\Calls"
 PROCESSED_PREFIX = "Stored-"
 FAILED_PREFIX = "BadData-"
 COMBINED_REPORT_FILENAME = "Combined_Analysis_Report.json"
+_SKIP_PREFIXES = (PROCESSED_PREFIX, FAILED_PREFIX)
+SQL_PARAM_LIMIT = 2000  # SQL Server rejects statements with more than 2100 parameters
+SQL_IN_CLAUSE_CHUNK = 1000  # Fixed IN-list size so repeated lookups share a cached plan
+REPORT_BATCH_SIZE = 500  # Reports parsed and written per transaction
+
+# --- Precompiled Patterns ---
+_WEEK_DIR_RE = re.compile(r'Week of (\d{4}-\d{2}-\d{2})')
+_EXT_PATH_RE = re.compile(r"Week of \d{4}-\d{2}-\d{2}[\\/](\d{4})[\\/]")
+_WIDE_INT_RE = re.compile(rb'\d{19}')  # Digit runs that may exceed 64 bits, which orjson would turn into floats
+
+# --- SQL Statements ---
+# Kept together as module-level constants so the schema each statement touches can be read in one place
+# and the single-report and batch paths share the same text.
+SQL_SELECT_AGENT_BY_EXTENSION = "SELECT AgentID FROM Agents WHERE Extension = ?"
+SQL_INSERT_AGENT = "INSERT INTO Agents (AgentName, EmailAddress, Extension) OUTPUT INSERTED.AgentID VALUES (?, ?, ?);"
+
+SQL_INSERT_ANALYSIS = """
+    INSERT INTO IndividualCallAnalyses (
+        AgentID, TechDispatcherNameRaw, OriginalAudioFileName, CallDuration, ClientName,
+        ClientFacilityCompany, TicketNumber, ClientCallbackNumber, TicketStatusType,
+        CallSubjectSummary, ConcludingRemarks_Positive, ConcludingRemarks_Negative,
+        ConcludingRemarks_Coaching
+    ) OUTPUT INSERTED.AnalysisID VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+SQL_CREATE_ANALYSIS_STAGING = """
+    DROP TABLE IF EXISTS #StagedCallAnalyses;
+    SELECT TOP 0 CAST(0 AS INT) AS RowNum,
+        AgentID, TechDispatcherNameRaw, OriginalAudioFileName, CallDuration, ClientName,
+        ClientFacilityCompany, TicketNumber, ClientCallbackNumber, TicketStatusType,
+        CallSubjectSummary, ConcludingRemarks_Positive, ConcludingRemarks_Negative,
+        ConcludingRemarks_Coaching
+    INTO #StagedCallAnalyses FROM IndividualCallAnalyses;
+"""
+SQL_INSERT_ANALYSIS_STAGING = """
+    INSERT INTO #StagedCallAnalyses (
+        RowNum, AgentID, TechDispatcherNameRaw, OriginalAudioFileName, CallDuration, ClientName,
+        ClientFacilityCompany, TicketNumber, ClientCallbackNumber, TicketStatusType,
+        CallSubjectSummary, ConcludingRemarks_Positive, ConcludingRemarks_Negative,
+        ConcludingRemarks_Coaching
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+SQL_MERGE_ANALYSIS_STAGING = """
+    MERGE INTO IndividualCallAnalyses AS t
+    USING #StagedCallAnalyses AS s ON 1 = 0
+    WHEN NOT MATCHED THEN INSERT (
+        AgentID, TechDispatcherNameRaw, OriginalAudioFileName, CallDuration, ClientName,
+        ClientFacilityCompany, TicketNumber, ClientCallbackNumber, TicketStatusType,
+        CallSubjectSummary, ConcludingRemarks_Positive, ConcludingRemarks_Negative,
+        ConcludingRemarks_Coaching
+    ) VALUES (
+        s.AgentID, s.TechDispatcherNameRaw, s.OriginalAudioFileName, s.CallDuration, s.ClientName,
+        s.ClientFacilityCompany, s.TicketNumber, s.ClientCallbackNumber, s.TicketStatusType,
+        s.CallSubjectSummary, s.ConcludingRemarks_Positive, s.ConcludingRemarks_Negative,
+        s.ConcludingRemarks_Coaching
+    )
+    OUTPUT s.RowNum, INSERTED.AnalysisID;
+"""
+SQL_DROP_ANALYSIS_STAGING = "DROP TABLE #StagedCallAnalyses;"
+SQL_INSERT_EVAL_ITEMS = "INSERT INTO IndividualEvaluationItems (AnalysisID, QualityPointID, Finding, ExplanationSnippets) VALUES (?, ?, ?, ?)"
+
+SQL_INSERT_COMBINED = """
+    INSERT INTO CombinedAnalyses (
+        AgentID, AnalysisPeriodNote, NumberOfReportsProvided, NumberOfReportsSuccessfullyAnalyzed,
+        Snapshot_TotalCallsContributing, Snapshot_PositiveCount, Snapshot_NegativeCount, Snapshot_NeutralCount
+    ) OUTPUT INSERTED.CombinedAnalysisID VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+"""
+SQL_INSERT_STRENGTHS = "INSERT INTO CombinedAnalysisStrengths (CombinedAnalysisID, StrengthText) VALUES (?, ?)"
+SQL_INSERT_DEV_AREAS = "INSERT INTO CombinedAnalysisDevelopmentAreas (CombinedAnalysisID, DevelopmentAreaText) VALUES (?, ?)"
+SQL_INSERT_COACHING_ACTIONS = "INSERT INTO CombinedAnalysisCoachingActions (CoachingFocusID, ActionText) VALUES (?, ?)"
+SQL_INSERT_QP_DETAILS = "INSERT INTO CombinedAnalysisQualityPointDetails (CombinedAnalysisID, QualityPointID, FindingsSummary_Positive, FindingsSummary_Negative, FindingsSummary_Neutral, TrendObservation) VALUES (?, ?, ?, ?, ?, ?)"
+
+# Used when [Database] QualityPointTableType names a user-defined table type on the server, e.g.
+#   CREATE TYPE dbo.QualityPointTextList AS TABLE (QualityPointText NVARCHAR(450) NOT NULL, IsBonus BIT NOT NULL);
+# with QualityPointText matching the QualityPointsMaster column. The whole set travels as one parameter.
+SQL_UPSERT_QUALITY_POINTS_TVP = """
+    SET NOCOUNT ON;
+    DROP TABLE IF EXISTS #QualityPointBatch;
+    SELECT QualityPointText, IsBonus INTO #QualityPointBatch FROM ?;
+    INSERT INTO QualityPointsMaster (QualityPointText, IsBonus)
+        SELECT s.QualityPointText, s.IsBonus FROM #QualityPointBatch AS s
+        WHERE NOT EXISTS (SELECT 1 FROM QualityPointsMaster AS t WHERE t.QualityPointText = s.QualityPointText);
+    SELECT t.QualityPointText, t.QualityPointID
+        FROM QualityPointsMaster AS t JOIN #QualityPointBatch AS s ON t.QualityPointText = s.QualityPointText;
+"""
 
 
 # --- Determine Script Directory ---
@@ -101,25 +195,24 @@ def parse_arguments(config: configparser.ConfigParser) -> argparse.Namespace:
 def find_latest_week_folder(root_dir: str) -> Optional[str]:
     """Finds the most recent 'Week of YY-MM-DD' directory."""
     week_folders = []
-    date_pattern = re.compile(r'Week of (\d{4}-\d{2}-\d{2})')
     
     try:
-        for item in os.listdir(root_dir):
-            full_path = os.path.join(root_dir, item)
-            if os.path.isdir(full_path):
-                match = date_pattern.search(item)
-                if match:
-                    try:
-                        folder_date = datetime.datetime.strptime(match.group(1), '%Y-%m-%d').date()
-                        week_folders.append((folder_date, full_path))
-                    except ValueError:
-                        logger.warning(f"Found folder '{item}' with matching pattern but invalid date.")
+        with os.scandir(root_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    match = _WEEK_DIR_RE.search(entry.name)
+                    if match:
+                        try:
+                            folder_date = datetime.datetime.strptime(match.group(1), '%Y-%m-%d').date()
+                            week_folders.append((folder_date, entry.path))
+                        except ValueError:
+                            logger.warning(f"Found folder '{entry.name}' with matching pattern but invalid date.")
         
         if not week_folders:
             logger.warning(f"No directories matching 'Week of YY-MM-DD' found in '{root_dir}'.")
             return None
             
-        latest_folder = sorted(week_folders, key=lambda x: x[0], reverse=True)[0]
+        latest_folder = max(week_folders, key=lambda x: x[0])
         logger.info(f"Found latest week folder: {latest_folder[1]}")
         return latest_folder[1]
         
@@ -162,14 +255,12 @@ def parse_extlist_data(extlist_path: str) -> Dict[str, Dict[str, str]]:
         logger.error(f"Agent data file not found: '{extlist_path}'. Cannot map agents.")
         return {}
     try:
-        with open(extlist_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                s_line = line.strip()
-                if not s_line or s_line.startswith('#'): continue
-                parts = s_line.split('\t')
-                if len(parts) == 3:
-                    ext, name, email = parts[0].strip(), parts[1].strip(), parts[2].strip()
-                    if ext: members_by_ext[ext] = {"full_name": name, "email": email, "extension": ext}
+        with open(extlist_path, 'r', encoding='utf-8', newline='') as f:
+            # Lines are stripped first so a trailing tab does not add an empty fourth field
+            for row in csv.reader((line.strip() for line in f), delimiter='\t', quoting=csv.QUOTE_NONE):
+                if not row or row[0].startswith('#') or len(row) != 3: continue
+                ext, name, email = row[0].strip(), row[1].strip(), row[2].strip()
+                if ext: members_by_ext[ext] = {"full_name": name, "email": email, "extension": ext}
         logger.info(f"Successfully parsed {len(members_by_ext)} members, keyed by extension.")
         return members_by_ext
     except Exception as e:
@@ -177,18 +268,44 @@ def parse_extlist_data(extlist_path: str) -> Dict[str, Dict[str, str]]:
         return {}
 
 
-def extract_extension_from_path(file_path: str) -> Optional[str]:
-    """Extracts the 4-digit extension from the file's directory path."""
-    match = re.search(r"Week of \d{4}-\d{2}-\d{2}[\\/](\d{4})[\\/]", file_path)
+def extract_extension_from_path(dir_path: str) -> Optional[str]:
+    """Extracts the 4-digit extension from a 'Week of YYYY-MM-DD/<extension>' directory path."""
+    match = _EXT_PATH_RE.search(os.path.join(dir_path, ''))
     if match:
         extension = match.group(1)
-        logger.debug(f"Extracted extension '{extension}' from path '{file_path}'.")
+        logger.debug("Extracted extension '%s' from path '%s'.", extension, dir_path)
         return extension
-    
-    logger.warning(f"Could not extract extension from path: '{file_path}'.")
     return None
 
 
+def chunked(items: List, size: int) -> Iterator[List]:
+    """Yields successive slices of at most `size` items from a list."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def iter_report_files(folder: str, extension: Optional[str] = None) -> Iterator[Tuple[pathlib.Path, Optional[str]]]:
+    """
+    Recursively yields (file_path, extension) for new, valid report files beneath a folder.
+    The agent extension is resolved once per directory and inherited by everything below it.
+    """
+    if extension is None:
+        extension = extract_extension_from_path(folder)
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from iter_report_files(entry.path, extension)
+                elif entry.is_file():
+                    name = entry.name
+                    # Skip already-handled files first, then accept only analysis files and combined reports
+                    if name.startswith(_SKIP_PREFIXES): continue
+                    if name == COMBINED_REPORT_FILENAME or name.endswith('_analysis.json'):
+                        yield pathlib.Path(entry.path), extension
+    except OSError as e:
+        logger.warning(f"Could not scan directory '{folder}': {e}")
+
+
 def get_or_create_agent(cursor: pyodbc.Cursor, agent_details: Dict[str, str]) -> Optional[int]:
     """
     Gets the AgentID for a given agent, creating them if they don't exist.
@@ -202,16 +319,14 @@ def get_or_create_agent(cursor: pyodbc.Cursor, agent_details: Dict[str, str]) ->
         return None
 
     try:
-        cursor.execute("SELECT AgentID FROM Agents WHERE Extension = ?", extension)
+        cursor.execute(SQL_SELECT_AGENT_BY_EXTENSION, extension)
         row = cursor.fetchone()
         if row:
             return row.AgentID
 
         logger.info(f"Agent '{agent_name}' with extension '{extension}' not found. Creating new record.")
         email = agent_details.get('email')
-        
-        insert_sql = "INSERT INTO Agents (AgentName, EmailAddress, Extension) OUTPUT INSERTED.AgentID VALUES (?, ?, ?);"
-        new_agent_id = cursor.execute(insert_sql, agent_name, email, extension).fetchval()
+        new_agent_id = cursor.execute(SQL_INSERT_AGENT, agent_name, email, extension).fetchval()
         logger.info(f"Created new agent '{agent_name}' with AgentID: {new_agent_id}.")
         return new_agent_id
         
@@ -230,79 +345,204 @@ def get_or_create_agent(cursor: pyodbc.Cursor, agent_details: Dict[str, str]) ->
         raise
 
 
-def get_or_create_quality_points(cursor: pyodbc.Cursor, qp_texts: Set[str]) -> Dict[str, int]:
-    """Efficiently gets IDs for existing quality points and creates non-existent ones."""
+def get_or_create_agents(cursor: pyodbc.Cursor, agents: List[Dict[str, str]]) -> Dict[str, int]:
+    """
+    Resolves AgentIDs for many agents at once, keyed by extension.
+    Missing agents are created by a single multi-row MERGE per chunk; pre-existing ones are then
+    picked up with a SELECT on the extensions the MERGE did not return.
+    """
+    agents_by_ext = {}
+    for agent_details in agents:
+        if not agent_details.get("full_name") or not agent_details.get("extension"):
+            raise ValueError(f"Agent details missing name or extension: {agent_details}")
+        agents_by_ext.setdefault(agent_details["extension"], agent_details)
+
+    ext_to_agent_id = {}
+    try:
+        agent_rows = [(ext, details["full_name"], details.get("email")) for ext, details in agents_by_ext.items()]
+        for chunk in chunked(agent_rows, SQL_PARAM_LIMIT // 3):
+            sql_merge = f"""
+                MERGE Agents AS t
+                USING (VALUES {', '.join(['(?, ?, ?)'] * len(chunk))}) AS s (Extension, AgentName, EmailAddress)
+                ON t.Extension = s.Extension
+                WHEN NOT MATCHED THEN INSERT (AgentName, EmailAddress, Extension) VALUES (s.AgentName, s.EmailAddress, s.Extension)
+                OUTPUT INSERTED.Extension, INSERTED.AgentID;
+            """
+            cursor.execute(sql_merge, [value for row in chunk for value in row])
+            for row in cursor.fetchall():
+                ext_to_agent_id[row.Extension] = row.AgentID
+                logger.info(f"Created new agent '{agents_by_ext[row.Extension]['full_name']}' with AgentID: {row.AgentID}.")
+
+        existing_exts = [ext for ext in agents_by_ext if ext not in ext_to_agent_id]
+        for chunk in chunked(existing_exts, SQL_IN_CLAUSE_CHUNK):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f"SELECT AgentID, Extension FROM Agents WHERE Extension IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                ext_to_agent_id[row.Extension] = row.AgentID
+
+        return ext_to_agent_id
+    except Exception as e:
+        logger.error(f"Database error while bulk getting/creating agents: {e}", exc_info=True)
+        raise
+
+
+def get_or_create_quality_points(cursor: pyodbc.Cursor, qp_texts: Set[str], qp_table_type: Optional[str] = None) -> Dict[str, int]:
+    """
+    Efficiently gets IDs for existing quality points and creates non-existent ones.
+    When a server-side table type is configured, the whole set is upserted in one round trip as a
+    table-valued parameter; otherwise chunked IN-clause lookups and multi-row inserts are used.
+    """
     qp_map = {}
     if not qp_texts: return qp_map
 
+    # (QualityPointText, IsBonus) rows, built once for whichever write path is used
+    qp_rows = [(text, 1 if "[BONUS]" in text.upper() else 0) for text in qp_texts]
+
     try:
-        placeholders = ', '.join(['?'] * len(qp_texts))
-        sql_select = f"SELECT QualityPointText, QualityPointID FROM QualityPointsMaster WHERE QualityPointText IN ({placeholders})"
-        cursor.execute(sql_select, *list(qp_texts))
-        for row in cursor.fetchall():
-            qp_map[row.QualityPointText] = row.QualityPointID
+        if qp_table_type:
+            schema_name, _, type_name = qp_table_type.rpartition('.')
+            tvp = [type_name, schema_name or 'dbo'] + qp_rows
+            cursor.execute(SQL_UPSERT_QUALITY_POINTS_TVP, [tvp])
+            for row in cursor.fetchall():
+                qp_map[row.QualityPointText] = row.QualityPointID
+            logger.info(f"Resolved {len(qp_map)} quality points via table-valued parameter '{qp_table_type}'.")
+            return qp_map
+
+        for chunk in chunked([text for text, _ in qp_rows], SQL_IN_CLAUSE_CHUNK):
+            placeholders = ', '.join(['?'] * len(chunk))
+            sql_select = f"SELECT QualityPointText, QualityPointID FROM QualityPointsMaster WHERE QualityPointText IN ({placeholders})"
+            cursor.execute(sql_select, chunk)
+            for row in cursor.fetchall():
+                qp_map[row.QualityPointText] = row.QualityPointID
         
-        new_qps_to_insert = [(text, 1 if "[BONUS]" in text.upper() else 0) for text in qp_texts if text not in qp_map]
+        new_qps_to_insert = [row for row in qp_rows if row[0] not in qp_map]
         
         if new_qps_to_insert:
             logger.info(f"Found {len(new_qps_to_insert)} new quality points to insert.")
-            sql_insert = "INSERT INTO QualityPointsMaster (QualityPointText, IsBonus) VALUES (?, ?)"
-            cursor.fast_executemany = True
-            cursor.executemany(sql_insert, new_qps_to_insert)
+            for chunk in chunked(new_qps_to_insert, SQL_PARAM_LIMIT // 2):
+                sql_insert = (
+                    "INSERT INTO QualityPointsMaster (QualityPointText, IsBonus) "
+                    "OUTPUT INSERTED.QualityPointText, INSERTED.QualityPointID "
+                    f"VALUES {', '.join(['(?, ?)'] * len(chunk))}"
+                )
+                cursor.execute(sql_insert, [value for row in chunk for value in row])
+                for row in cursor.fetchall():
+                    qp_map[row.QualityPointText] = row.QualityPointID
             logger.info("Successfully batch-inserted new quality points.")
-
-            cursor.execute(sql_select, *list(qp_texts))
-            for row in cursor.fetchall():
-                qp_map[row.QualityPointText] = row.QualityPointID
         
         return qp_map
     except Exception as e:
         logger.error(f"Database error while getting/creating quality points: {e}", exc_info=True)
         raise
 
-def process_individual_json(cursor: pyodbc.Cursor, json_data: Dict, file_path: str, agent_id: int, qp_map: Dict):
-    """Processes a single individual analysis JSON and inserts data into the database."""
+def load_report(file_path: pathlib.Path) -> Tuple[pathlib.Path, Any]:
+    """Reads and decodes a report file. Returns (file_path, json_data), or (file_path, exception) on failure."""
+    try:
+        if orjson:
+            data = file_path.read_bytes()
+            if not _WIDE_INT_RE.search(data):
+                try:
+                    return file_path, orjson.loads(data)
+                except orjson.JSONDecodeError:
+                    pass  # e.g. NaN/Infinity, which the standard json module accepts
+            return file_path, json.loads(data.decode('utf-8'))
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return file_path, json.load(f)
+    except Exception as e:
+        return file_path, e
+
+
+def collect_quality_points(json_data: Dict) -> Iterator[str]:
+    """Yields the quality point texts a report references, rejecting any that are not text."""
+    for item in chain(json_data.get("detailed_evaluation", ()), json_data.get("detailed_quality_point_analysis", ())):
+        qp_text = item.get('quality_point')
+        if not qp_text: continue
+        if not isinstance(qp_text, str): raise ValueError(f"Invalid quality point {qp_text!r}: expected text.")
+        yield qp_text
+
+
+def resolve_agent_details(file_path: pathlib.Path, extension: Optional[str], ext_map: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    """Determines the agent a report belongs to from the extension of the folder it lives in."""
+    if extension:
+        agent_details = ext_map.get(extension)
+        if not agent_details:
+            logger.warning(f"Extension '{extension}' from path not in {EXT_LIST_FILE_NAME}. Recording as un-rostered.")
+            agent_details = {"full_name": f"Un-rostered Agent - {extension}", "email": None, "extension": extension}
+        return agent_details
+
+    timestamp_str = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
+    malformed_ext = f"UNKEYED_PATH_{timestamp_str}"
+    malformed_name = f"Unknown Agent (Unkeyed Path {timestamp_str})"
+    logger.error(f"Could not determine extension from path for '{file_path.name}'. Creating unique unknown agent.")
+    return {"full_name": malformed_name, "email": None, "extension": malformed_ext}
+
+
+def build_analysis_params(json_data: Dict, wav_name: str, agent_id: int) -> Tuple:
+    """Builds the IndividualCallAnalyses column values for a single analysis JSON."""
     summary = json_data.get('call_summary', {})
     remarks = json_data.get('concluding_remarks', {})
-    
-    sql_insert_analysis = """
-        INSERT INTO IndividualCallAnalyses (
-            AgentID, TechDispatcherNameRaw, OriginalAudioFileName, CallDuration, ClientName,
-            ClientFacilityCompany, TicketNumber, ClientCallbackNumber, TicketStatusType,
-            CallSubjectSummary, ConcludingRemarks_Positive, ConcludingRemarks_Negative,
-            ConcludingRemarks_Coaching
-        ) OUTPUT INSERTED.AnalysisID VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-    """
-    params = (
-        agent_id, summary.get('tech_dispatcher_name'), os.path.basename(file_path).replace('_analysis.json', '.wav'),
+    return (
+        agent_id, summary.get('tech_dispatcher_name'), wav_name,
         summary.get('call_duration'), summary.get('client_name'), summary.get('client_facility_company'),
         summary.get('ticket_number'), summary.get('client_callback_number'), summary.get('ticket_status_type'),
         summary.get('call_subject_summary'), remarks.get('summary_positive_findings'),
         remarks.get('summary_negative_findings'), remarks.get('coaching_plan_for_growth')
     )
-    analysis_id = cursor.execute(sql_insert_analysis, params).fetchval()
-    logger.debug(f"Inserted IndividualCallAnalyses record with ID: {analysis_id}")
+
+
+def build_eval_params(analysis_id: int, eval_items: List[Dict], qp_map: Dict) -> List[Tuple]:
+    """Builds the IndividualEvaluationItems rows for one analysis, skipping unmapped quality points."""
+    eval_params = []
+    append = eval_params.append
+    for item in eval_items:
+        qp_text = item.get('quality_point')
+        qp_id = qp_map.get(qp_text) if qp_text else None
+        if qp_id is not None:
+            append((analysis_id, qp_id, item.get('finding'), item.get('explanation_snippets')))
+    return eval_params
+
+
+def process_individual_json(cursor: pyodbc.Cursor, json_data: Dict, wav_name: str, agent_id: int, qp_map: Dict):
+    """Processes a single individual analysis JSON and inserts data into the database."""
+    params = build_analysis_params(json_data, wav_name, agent_id)
+    analysis_id = cursor.execute(SQL_INSERT_ANALYSIS, params).fetchval()
+    logger.debug("Inserted IndividualCallAnalyses record with ID: %s", analysis_id)
     
-    eval_items = json_data.get('detailed_evaluation', [])
-    eval_params = [(analysis_id, qp_map.get(item.get('quality_point')), item.get('finding'), item.get('explanation_snippets')) for item in eval_items if qp_map.get(item.get('quality_point')) is not None]
+    eval_params = build_eval_params(analysis_id, json_data.get('detailed_evaluation', []), qp_map)
     
     if eval_params:
-        sql_insert_items = "INSERT INTO IndividualEvaluationItems (AnalysisID, QualityPointID, Finding, ExplanationSnippets) VALUES (?, ?, ?, ?)"
-        cursor.fast_executemany = True
-        cursor.executemany(sql_insert_items, eval_params)
-        logger.debug(f"Inserted {len(eval_params)} evaluation items for AnalysisID {analysis_id}.")
+        cursor.executemany(SQL_INSERT_EVAL_ITEMS, eval_params)
+        logger.debug("Inserted %d evaluation items for AnalysisID %s.", len(eval_params), analysis_id)
+
+def process_individual_json_batch(cursor: pyodbc.Cursor, reports: List[Tuple[str, Dict, int]], qp_map: Dict):
+    """
+    Bulk-inserts a batch of individual analysis JSONs given as (wav_name, json_data, agent_id).
+    Rows are loaded into a staging table with fast_executemany and moved across with a MERGE
+    whose OUTPUT clause maps each staged row number back to its new AnalysisID.
+    """
+    if not reports: return
+
+    cursor.execute(SQL_CREATE_ANALYSIS_STAGING)
+    staged_rows = [(row_num,) + build_analysis_params(json_data, wav_name, agent_id) for row_num, (wav_name, json_data, agent_id) in enumerate(reports)]
+    cursor.executemany(SQL_INSERT_ANALYSIS_STAGING, staged_rows)
+
+    analysis_ids = {row.RowNum: row.AnalysisID for row in cursor.execute(SQL_MERGE_ANALYSIS_STAGING).fetchall()}
+    cursor.execute(SQL_DROP_ANALYSIS_STAGING)
+    logger.debug("Inserted %d IndividualCallAnalyses records.", len(analysis_ids))
+
+    eval_params = []
+    for row_num, (_, json_data, _) in enumerate(reports):
+        eval_params.extend(build_eval_params(analysis_ids[row_num], json_data.get('detailed_evaluation', []), qp_map))
+
+    if eval_params:
+        cursor.executemany(SQL_INSERT_EVAL_ITEMS, eval_params)
+        logger.debug("Inserted %d evaluation items across %d analyses.", len(eval_params), len(analysis_ids))
 
 def process_combined_json(cursor: pyodbc.Cursor, json_data: Dict, agent_id: int, qp_map: Dict):
     """Processes the combined analysis JSON and inserts data into the database."""
     header = json_data.get('report_header', {})
     snapshot = json_data.get('overall_performance_snapshot', {})
     
-    sql_insert_combined = """
-        INSERT INTO CombinedAnalyses (
-            AgentID, AnalysisPeriodNote, NumberOfReportsProvided, NumberOfReportsSuccessfullyAnalyzed,
-            Snapshot_TotalCallsContributing, Snapshot_PositiveCount, Snapshot_NegativeCount, Snapshot_NeutralCount
-        ) OUTPUT INSERTED.CombinedAnalysisID VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-    """
     params = (
         agent_id, header.get('analysis_period_note'), header.get('number_of_reports_provided'),
         header.get('number_of_reports_successfully_analyzed'), snapshot.get('total_calls_contributing_to_aggregates'),
@@ -310,23 +550,35 @@ def process_combined_json(cursor: pyodbc.Cursor, json_data: Dict, agent_id: int,
         snapshot.get('aggregate_findings_counts', {}).get('negative_count'),
         snapshot.get('aggregate_findings_counts', {}).get('neutral_count')
     )
-    combined_id = cursor.execute(sql_insert_combined, params).fetchval()
-    logger.debug(f"Inserted CombinedAnalyses record with ID: {combined_id}")
+    combined_id = cursor.execute(SQL_INSERT_COMBINED, params).fetchval()
+    logger.debug("Inserted CombinedAnalyses record with ID: %s", combined_id)
 
     qual_summary = json_data.get('qualitative_summary_and_coaching_plan', {})
-    cursor.fast_executemany = True
-    
+
     if strengths := qual_summary.get('overall_strengths_observed', []):
-        cursor.executemany("INSERT INTO CombinedAnalysisStrengths (CombinedAnalysisID, StrengthText) VALUES (?, ?)", [(combined_id, s) for s in strengths])
+        cursor.executemany(SQL_INSERT_STRENGTHS, [(combined_id, s) for s in strengths])
 
     if dev_areas := qual_summary.get('overall_areas_for_development', []):
-        cursor.executemany("INSERT INTO CombinedAnalysisDevelopmentAreas (CombinedAnalysisID, DevelopmentAreaText) VALUES (?, ?)", [(combined_id, d) for d in dev_areas])
-
-    for focus_item in qual_summary.get('consolidated_coaching_focus', []):
-        if area_text := focus_item.get('area'):
-            focus_id = cursor.execute("INSERT INTO CombinedAnalysisCoachingFocus (CombinedAnalysisID, AreaText) OUTPUT INSERTED.CoachingFocusID VALUES (?, ?);", combined_id, area_text).fetchval()
-            if actions := focus_item.get('specific_actions', []):
-                cursor.executemany("INSERT INTO CombinedAnalysisCoachingActions (CoachingFocusID, ActionText) VALUES (?, ?)", [(focus_id, a) for a in actions])
+        cursor.executemany(SQL_INSERT_DEV_AREAS, [(combined_id, d) for d in dev_areas])
+
+    # INSERT ... OUTPUT does not guarantee row order, so focus areas go through a MERGE that
+    # returns each source ordinal next to its new CoachingFocusID.
+    focus_items = [item for item in qual_summary.get('consolidated_coaching_focus', []) if item.get('area')]
+    focus_rows = [(ordinal, combined_id, item['area']) for ordinal, item in enumerate(focus_items)]
+    focus_ids = {}
+    for chunk in chunked(focus_rows, SQL_PARAM_LIMIT // 3):
+        sql_merge_focus = f"""
+            MERGE INTO CombinedAnalysisCoachingFocus AS t
+            USING (VALUES {', '.join(['(?, ?, ?)'] * len(chunk))}) AS s (Ordinal, CombinedAnalysisID, AreaText) ON 1 = 0
+            WHEN NOT MATCHED THEN INSERT (CombinedAnalysisID, AreaText) VALUES (s.CombinedAnalysisID, s.AreaText)
+            OUTPUT s.Ordinal, INSERTED.CoachingFocusID;
+        """
+        for row in cursor.execute(sql_merge_focus, [value for focus_row in chunk for value in focus_row]).fetchall():
+            focus_ids[row.Ordinal] = row.CoachingFocusID
+
+    action_params = [(focus_ids[ordinal], a) for ordinal, item in enumerate(focus_items) for a in item.get('specific_actions') or []]
+    if action_params:
+        cursor.executemany(SQL_INSERT_COACHING_ACTIONS, action_params)
     
     qp_detail_params = []
     for detail in json_data.get('detailed_quality_point_analysis', []):
@@ -337,93 +589,156 @@ def process_combined_json(cursor: pyodbc.Cursor, json_data: Dict, agent_id: int,
                 findings.get('neutral_count'), detail.get('trend_observation')
             ))
     if qp_detail_params:
-        sql_insert_qp_detail = "INSERT INTO CombinedAnalysisQualityPointDetails (CombinedAnalysisID, QualityPointID, FindingsSummary_Positive, FindingsSummary_Negative, FindingsSummary_Neutral, TrendObservation) VALUES (?, ?, ?, ?, ?, ?)"
-        cursor.executemany(sql_insert_qp_detail, qp_detail_params)
-        logger.debug(f"Inserted {len(qp_detail_params)} detailed QP analysis records.")
+        cursor.executemany(SQL_INSERT_QP_DETAILS, qp_detail_params)
+        logger.debug("Inserted %d detailed QP analysis records.", len(qp_detail_params))
+
+
+def mark_file(file_path: pathlib.Path, is_success: bool):
+    """Renames a processed report with the stored or failed prefix so it is not picked up again."""
+    new_prefix = PROCESSED_PREFIX if is_success else FAILED_PREFIX
+    try:
+        current_base_name = file_path.name
+        new_path = file_path.with_name(new_prefix + current_base_name)
+        try:
+            os.rename(file_path, new_path)
+        except OSError:
+            shutil.move(file_path, new_path)
+        logger.info(f"Renamed '{current_base_name}' with prefix '{new_prefix}'.")
+    except Exception as e_rename:
+        logger.error(f"CRITICAL: Failed to rename file '{file_path}'. Error: {e_rename}")
+
+
+def import_report_batch(cursor: pyodbc.Cursor, reports: List[Tuple[pathlib.Path, Dict[str, str], Dict, Optional[str]]], qp_map: Dict[str, int]):
+    """Writes a batch of parsed reports in the caller's transaction, using bulk inserts for individual analyses."""
+    agent_ids = get_or_create_agents(cursor, [agent_details for _, agent_details, _, _ in reports])
+
+    individual_reports = []
+    for file_path, agent_details, json_data, wav_name in reports:
+        agent_id = agent_ids[agent_details["extension"]]
+        if file_path.name == COMBINED_REPORT_FILENAME:
+            process_combined_json(cursor, json_data, agent_id, qp_map)
+        else:
+            individual_reports.append((wav_name, json_data, agent_id))
+
+    process_individual_json_batch(cursor, individual_reports, qp_map)
+
+
+def import_single_report(conn: pyodbc.Connection, cursor: pyodbc.Cursor, file_path: pathlib.Path, agent_details: Dict[str, str], json_data: Dict, wav_name: Optional[str], qp_table_type: Optional[str] = None) -> bool:
+    """Writes one parsed report, including its own quality points, in its own transaction. Returns True if it was committed."""
+    base_name = file_path.name
+    try:
+        qp_map = get_or_create_quality_points(cursor, set(collect_quality_points(json_data)), qp_table_type)
+        agent_id = get_or_create_agent(cursor, agent_details)
+        if not agent_id: raise ValueError(f"Could not get/create ID for agent: {agent_details}")
+
+        if base_name == COMBINED_REPORT_FILENAME:
+            process_combined_json(cursor, json_data, agent_id, qp_map)
+        else:
+            process_individual_json(cursor, json_data, wav_name, agent_id, qp_map)
+
+        conn.commit()
+        logger.info(f"Successfully committed changes for {base_name}.")
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to process file '{file_path}': {e}", exc_info=True)
+        conn.rollback()
+        return False
+
+
+def process_report_batch(conn: pyodbc.Connection, cursor: pyodbc.Cursor, executor: concurrent.futures.Executor,
+                         batch: List[Tuple[pathlib.Path, Optional[str]]], ext_map: Dict[str, Dict[str, str]],
+                         qp_table_type: Optional[str] = None):
+    """
+    Parses and imports one batch of discovered (file_path, extension) reports.
+    The batch's quality points and reports are written in a single pass. If that fails, it is rolled back and each
+    report is retried in its own transaction so that only the offending files are quarantined.
+    """
+    # Phase 1: parse the batch into memory and collect the quality points it references.
+    # File reads and decoding are independent per report, so they are overlapped on the thread pool.
+    parsed = executor.map(load_report, [file_path for file_path, _ in batch])
+
+    reports = []
+    all_qps = set()
+    for (file_path, json_data), (_, extension) in zip(parsed, batch):
+        logger.info(f"--- Parsing file: {file_path.name} ---")
+        try:
+            if isinstance(json_data, Exception): raise json_data
+            agent_details = resolve_agent_details(file_path, extension, ext_map)
+            all_qps.update(collect_quality_points(json_data))
+        except Exception as e:
+            logger.error(f"Failed to parse file '{file_path}': {e}", exc_info=True)
+            mark_file(file_path, False)
+            continue
+        # The source recording's name is derived here, while the file name is already at hand
+        wav_name = None if file_path.name == COMBINED_REPORT_FILENAME else file_path.name.removesuffix('_analysis.json') + '.wav'
+        reports.append((file_path, agent_details, json_data, wav_name))
+
+    if not reports:
+        logger.info("No report in this batch could be parsed.")
+        return
+
+    # Phase 2: resolve the batch's quality points once, then write all parsed reports in one transaction.
+    # Quality points are shared master data, so they are committed ahead of the reports that reference them.
+    try:
+        qp_map = get_or_create_quality_points(cursor, all_qps, qp_table_type)
+        conn.commit()
+        import_report_batch(cursor, reports, qp_map)
+        conn.commit()
+        logger.info(f"Successfully committed {len(reports)} reports in a single batch.")
+        for file_path, _, _, _ in reports:
+            mark_file(file_path, True)
+    except Exception as e:
+        logger.error(f"Batch import failed, retrying each report individually: {e}", exc_info=True)
+        conn.rollback()
+        for file_path, agent_details, json_data, wav_name in reports:
+            logger.info(f"--- Processing file: {file_path.name} ---")
+            mark_file(file_path, import_single_report(conn, cursor, file_path, agent_details, json_data, wav_name, qp_table_type))
 
 
 def process_folder(target_folder: str, config: configparser.ConfigParser):
-    """Orchestrates the processing of all valid JSON files within a given folder."""
+    """
+    Orchestrates the processing of all valid JSON files within a given folder.
+    Reports are streamed from the directory scan in batches of REPORT_BATCH_SIZE, so memory use is
+    bounded by the batch rather than by the number of files in the folder.
+    """
     logger.info(f"Starting processing for folder: {target_folder}")
     conn = None
     try:
         ext_map = parse_extlist_data(os.path.join(script_dir, EXT_LIST_FILE_NAME))
+        qp_table_type = config.get('Database', 'QualityPointTableType', fallback='').strip() or None
         
-        # =================================================================
-        # === MODIFIED LOGIC: Selectively find only valid report files
-        # =================================================================
-        files_to_process = []
-        for root, _, files in os.walk(target_folder):
-            for file in files:
-                # Process only analysis files and combined reports, ignore errors and other json files
-                if (file.endswith('_analysis.json') or COMBINED_REPORT_FILENAME in file) and \
-                   not file.startswith((PROCESSED_PREFIX, FAILED_PREFIX)):
-                    files_to_process.append(os.path.join(root, file))
-        # =================================================================
-        
-        if not files_to_process:
-            logger.info("No new, valid JSON report files to process in this folder.")
-            return
-
-        logger.info(f"Found {len(files_to_process)} new JSON reports to process.")
-        
-        conn = get_db_connection(config)
-        cursor = conn.cursor()
-
-        for file_path in files_to_process:
-            base_name = os.path.basename(file_path)
-            logger.info(f"--- Processing file: {base_name} ---")
-            is_success = False
-            try:
-                extension = extract_extension_from_path(file_path)
-                
-                agent_details = None
-                if extension:
-                    agent_details = ext_map.get(extension)
-                    if not agent_details:
-                        logger.warning(f"Extension '{extension}' from path not in {EXT_LIST_FILE_NAME}. Recording as un-rostered.")
-                        agent_details = {"full_name": f"Un-rostered Agent - {extension}", "email": None, "extension": extension}
-                else:
-                    timestamp_str = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
-                    malformed_ext = f"UNKEYED_PATH_{timestamp_str}"
-                    malformed_name = f"Unknown Agent (Unkeyed Path {timestamp_str})"
-                    logger.error(f"Could not determine extension from path for '{base_name}'. Creating unique unknown agent.")
-                    agent_details = {"full_name": malformed_name, "email": None, "extension": malformed_ext}
-
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                
-                conn.autocommit = False
-                
-                agent_id = get_or_create_agent(cursor, agent_details)
-                if not agent_id: raise ValueError(f"Could not get/create ID for agent: {agent_details}")
-
-                all_qps_in_file = {item['quality_point'] for item in json_data.get("detailed_evaluation", [])}
-                all_qps_in_file.update({item['quality_point'] for item in json_data.get("detailed_quality_point_analysis", [])})
-                qp_map = get_or_create_quality_points(cursor, all_qps_in_file)
-
-                if COMBINED_REPORT_FILENAME in base_name:
-                    process_combined_json(cursor, json_data, agent_id, qp_map)
-                else:
-                    process_individual_json(cursor, json_data, file_path, agent_id, qp_map)
-                
-                conn.commit()
-                logger.info(f"Successfully committed changes for {base_name}.")
-                is_success = True
-
-            except Exception as e:
-                logger.error(f"Failed to process file '{file_path}': {e}", exc_info=True)
-                if conn and not conn.autocommit: conn.rollback()
-                is_success = False
-            
-            finally:
-                new_prefix = PROCESSED_PREFIX if is_success else FAILED_PREFIX
+        # Renaming a report during the scan is safe: its new name carries a prefix the scan skips.
+        files_to_process = iter_report_files(target_folder)
+        total_reports = 0
+
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            while batch := list(islice(files_to_process, REPORT_BATCH_SIZE)):
+                if conn is None:
+                    conn = get_db_connection(config)
+                    conn.autocommit = False
+                    cursor = conn.cursor()
+                    cursor.fast_executemany = True
+
+                logger.info(f"Found {len(batch)} new JSON reports to process.")
+                total_reports += len(batch)
                 try:
-                    dir_name, current_base_name = os.path.split(file_path)
-                    shutil.move(file_path, os.path.join(dir_name, f"{new_prefix}{current_base_name}"))
-                    logger.info(f"Renamed '{current_base_name}' with prefix '{new_prefix}'.")
-                except Exception as e_rename:
-                    logger.error(f"CRITICAL: Failed to rename file '{file_path}'. Error: {e_rename}")
+                    process_report_batch(conn, cursor, executor, batch, ext_map, qp_table_type)
+                except Exception as e:
+                    # Only a broken connection gets here (its commit/rollback failed), so it is discarded and a fresh
+                    # one is opened for the next batch. Reports this batch already renamed keep their Stored-/BadData-
+                    # prefix; the rest keep their original names and are picked up again by the next run.
+                    logger.error(f"Failed to process a batch of {len(batch)} reports, reconnecting for the next batch: {e}", exc_info=True)
+                    try:
+                        conn.close()
+                    except Exception as close_error:
+                        logger.warning(f"Could not close the failed database connection: {close_error}")
+                    conn = None
+
+        if not total_reports:
+            logger.info("No new, valid JSON report files to process in this folder.")
+        else:
+            logger.info(f"Finished processing {total_reports} JSON reports.")
     
     except Exception as e:
         logger.critical(f"A major error occurred during folder processing: {e}", exc_info=True)